@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+'''
+	On-disk pickle cache shared by VideoFeatures and Experiments.
+
+	Each entry is stored as CACHE_FOLDER/<subfolder>/<key>.pkl, where key is a hex digest
+	computed by the caller from everything the cached result depends on.
+'''
+
+import os
+import pickle
+
+CACHE_FOLDER = "cache/"
+
+
+def load_cached(subfolder, key):
+    """Returns the object cached under key, or None if there is none.
+
+    Keyword arguments:
+    subfolder -- folder inside CACHE_FOLDER
+    key -- hex digest identifying the cached object
+    """
+    path = os.path.join(CACHE_FOLDER, subfolder, key + '.pkl')
+    if not os.path.isfile(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def save_cached(subfolder, key, obj):
+    """Pickles obj into the cache under key.
+
+    Keyword arguments:
+    subfolder -- folder inside CACHE_FOLDER
+    key -- hex digest identifying the cached object
+    obj -- object to cache
+    """
+    folder = os.path.join(CACHE_FOLDER, subfolder)
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    # Write to a temporary file first so an interrupted run never leaves a truncated entry.
+    path = os.path.join(folder, key + '.pkl')
+    with open(path + '.tmp', 'wb') as f:
+        pickle.dump(obj, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(path + '.tmp', path)
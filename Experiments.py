@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+'''
+	Cross-validation and hyperparameter search for the Machine Learning notebook.
+
+	Replaces the hand-written k-fold loops (cv_experiment, cv_experiment_tree and
+	cv_experiment_forest) with one runner that works for any scikit-learn estimator class:
+
+		from sklearn import svm
+		from Experiments import cv_experiment, param_grid
+
+		grid = param_grid(C=[0.001, 10, 50], gamma=np.arange(0.075, 0.13, 0.005), kernel=['rbf'])
+		results = cv_experiment(svm.SVC, grid, data_train, label_train, k=5)
+		print(results[-1])
+
+	The fold index arrays are computed once per run and the training data is sent to each worker
+	process once, rather than re-slicing it for every fold of every configuration. The grid is
+	evaluated across a process pool, and every finished configuration is pickled under
+	CACHE_FOLDER keyed by its params, a hash of the training data, k and the seed, so an
+	interrupted sweep picks up where it left off and repeated sweeps are free.
+
+	The seed only fixes the fold shuffle. Pass random_state in the grid for estimators
+	such as trees and forests so their cached results are reproducible.
+'''
+
+import time
+import hashlib
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from sklearn import metrics
+
+from Cache import load_cached, save_cached
+
+# Set in each worker process by _init_worker, so the data is pickled once per worker, not per task.
+_DATA = None
+
+
+def make_folds(num_examples, k, seed=None):
+    """Returns a list of k (train indices, validation indices) pairs.
+
+    The examples are shuffled once and cut into k parts of equal size, with the
+    last part taking the remainder.
+
+    Keyword arguments:
+    num_examples -- number of training examples
+    k -- number of folds
+    seed -- seed for the shuffle
+    """
+    idx = np.random.RandomState(seed).permutation(num_examples)
+    part_size = num_examples // k
+    bounds = [i * part_size for i in range(k)] + [num_examples]
+    parts = [idx[bounds[i]:bounds[i + 1]] for i in range(k)]
+    folds = []
+    for i in range(k):
+        train_idx = np.concatenate(parts[:i] + parts[i + 1:])
+        assert len(train_idx) + len(parts[i]) == num_examples
+        folds.append((train_idx, parts[i]))
+    return folds
+
+
+def param_grid(**axes):
+    """Returns a list of param dicts, one per combination of the given values.
+
+    The first keyword varies slowest, e.g. param_grid(C=[1, 10], gamma=[0.1, 0.2])
+    gives C=1 with both gammas, then C=10 with both gammas.
+
+    Keyword arguments:
+    axes -- param name -> list of values to try
+    """
+    names = list(axes.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*axes.values())]
+
+
+def data_hash(training_data, training_labels):
+    """Returns a hex digest of a feature matrix and its labels.
+
+    Keyword arguments:
+    training_data -- feature matrix
+    training_labels -- label array
+    """
+    # Object arrays would hash their element addresses rather than their values.
+    data = np.ascontiguousarray(training_data, dtype=float)
+    labels = np.asarray(training_labels).astype(str)
+    h = hashlib.sha1()
+    h.update(repr((data.shape, data.dtype.str, labels.shape)).encode('utf-8'))
+    h.update(data.tobytes())
+    h.update(labels.tobytes())
+    return h.hexdigest()
+
+
+def _clean_params(params):
+    # NumPy scalars (e.g. from np.arange) become plain Python numbers, so they
+    # print nicely and hash the same as the literal values.
+    return {name: getattr(value, 'item', lambda: value)() for name, value in params.items()}
+
+
+def _config_key(estimator, params, training_hash, k, seed):
+    key = (estimator.__module__, estimator.__name__, sorted(params.items()), training_hash, k, seed)
+    return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+
+def _init_worker(training_data, training_labels, folds):
+    global _DATA
+    _DATA = (training_data, training_labels, folds)
+
+
+def _evaluate(estimator, params):
+    training_data, training_labels, folds = _DATA
+    start = time.time()
+    val_scores = []
+    for train_idx, val_idx in folds:
+        model = estimator(**params)
+        model.fit(training_data[train_idx], training_labels[train_idx])
+        predictions = model.predict(training_data[val_idx])
+        val_scores.append(metrics.accuracy_score(training_labels[val_idx], predictions))
+    return val_scores, time.time() - start
+
+
+def cv_experiment(estimator, grid, training_data, training_labels, k=5, seed=0,
+                  processes=None, use_cache=True):
+    """Runs k-fold cross-validation for every configuration in grid.
+
+    Returns a list of (params, mean val accuracy, seconds) sorted by accuracy,
+    so the best configuration is last. Ties keep their order in grid, whether or
+    not the results came from the cache.
+
+    Keyword arguments:
+    estimator -- scikit-learn estimator class, e.g. svm.SVC
+    grid -- list of param dicts passed to estimator, e.g. from param_grid
+    training_data -- feature matrix
+    training_labels -- label array
+    k -- number of folds
+    seed -- seed for the fold shuffle
+    processes -- number of worker processes (default: one per CPU)
+    use_cache -- whether to reuse and store results under CACHE_FOLDER
+    """
+    training_data = np.asarray(training_data)
+    training_labels = np.asarray(training_labels)
+    assert len(training_data) == len(training_labels)
+    training_hash = data_hash(training_data, training_labels)
+
+    results = [None] * len(grid)
+    pending = []
+    for pos, params in enumerate(grid):
+        params = _clean_params(params)
+        key = _config_key(estimator, params, training_hash, k, seed)
+        cached = load_cached('cv_experiments', key) if use_cache else None
+        if cached is not None:
+            results[pos] = cached
+            print(params, "mean val accuracy: ", cached[1], "(cached)")
+        else:
+            pending.append((pos, key, params))
+
+    if pending:
+        folds = make_folds(len(training_data), k, seed)
+        errors = []
+        executor = ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                       initargs=(training_data, training_labels, folds))
+        try:
+            futures = {executor.submit(_evaluate, estimator, params): (pos, key, params)
+                       for pos, key, params in pending}
+            # Store each configuration as soon as it finishes, so an interrupted sweep can resume,
+            # and let one failing configuration not hold back or throw away the others.
+            for future in as_completed(futures):
+                pos, key, params = futures[future]
+                try:
+                    val_scores, seconds = future.result()
+                except Exception as e:
+                    print(params, "failed:", e)
+                    errors.append(e)
+                    continue
+                result = (params, float(np.mean(val_scores)), seconds)
+                if use_cache:
+                    save_cached('cv_experiments', key, result)
+                results[pos] = result
+                print(params, "mean val accuracy: ", result[1], "(%.2fs)" % seconds)
+        finally:
+            # On an interrupt, drop the queued configurations instead of running them all first.
+            executor.shutdown(wait=False, cancel_futures=True)
+        if errors:
+            raise errors[0]
+
+    # sorted is stable, so equal accuracies stay in grid order.
+    return sorted(results, key=lambda x: x[1])
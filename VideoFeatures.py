@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+'''
+	Per-video feature extraction for the Machine Learning notebook.
+
+	Takes the cleaned per-dataset comment dataframes (the `frames` list built in the notebook,
+	with the "Comment Length" and "Profane" columns already inserted) and the scraped video
+	metadata, and produces one row per video with the columns of VIDEO_DF.
+
+	Each dataset is reduced with a single groupby over "Video Title" instead of filtering the
+	whole dataframe once per video, and datasets are processed in parallel worker processes.
+	Results are pickled under CACHE_FOLDER, keyed by a hash of the dataset's contents, so
+	re-running the notebook only recomputes datasets whose comments or metadata changed.
+
+	Usage from the notebook:
+
+		from VideoFeatures import build_video_df
+		VIDEO_DF = build_video_df(frames, [tool.data for tool in tools], dataset_names, categories)
+'''
+
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from Cache import load_cached, save_cached
+
+# Bump this whenever the features computed below change, so stale cache entries are ignored.
+FEATURE_VERSION = 1
+
+VIDEO_COLUMNS = ['Video Title', 'Dataset Name', 'Category', 'Num Views', 'Like Count',
+                 'Dislike Count', 'Profane Rate', 'Num Comments',
+                 'Average Comment Length', 'Average Direct Comment Like Count',
+                 'Average Num Replies', 'Num Unique Authors', 'Comments Per View']
+
+# The comment columns the features are computed from. Only these go into the content hash.
+COMMENT_COLUMNS = ['Video Title', 'Author', 'Comment Length', 'Profane',
+                   'Like Count', 'Is Reply', 'Num_Replies']
+
+
+def video_stats(data, titles):
+    """Returns a dict of Video Title -> (view count, like count, dislike count)
+
+    Keyword arguments:
+    data -- scraped dictionary of {Video Title : (videoID, comments, stats)}
+    titles -- video titles to look up
+    """
+    stats = {}
+    for title in titles:
+        s = data[title][2]
+        stats[title] = (int(s[3]), int(s[4]), int(s[5]))
+    return stats
+
+
+def dataset_hash(df, stats, dataset_name, category):
+    """Returns a hex digest of everything the features of one dataset depend on.
+
+    Keyword arguments:
+    df -- cleaned comment dataframe of the dataset
+    stats -- dict returned by video_stats
+    dataset_name -- name of the dataset
+    category -- category label of the dataset
+    """
+    h = hashlib.sha1()
+    h.update(repr((FEATURE_VERSION, dataset_name, category)).encode('utf-8'))
+    h.update(pd.util.hash_pandas_object(df[COMMENT_COLUMNS], index=False).values.tobytes())
+    h.update(repr(sorted(stats.items())).encode('utf-8'))
+    return h.hexdigest()
+
+
+def dataset_video_features(df, stats, dataset_name, category):
+    """Returns a dataframe with one row of VIDEO_COLUMNS per video in df.
+
+    Keyword arguments:
+    df -- cleaned comment dataframe of the dataset
+    stats -- dict returned by video_stats
+    dataset_name -- name of the dataset
+    category -- category label of the dataset
+    """
+    # Keep the videos in order of first appearance, as the old per-video loop did.
+    titles = df['Video Title'].unique()
+    videos = df.groupby('Video Title', sort=False)
+    features = videos[['Profane', 'Comment Length']].mean().reindex(titles)
+    # A missing Author counts as one more author, as len(vid["Author"].unique()) did.
+    num_authors = videos['Author'].nunique(dropna=False).reindex(titles)
+
+    directs = df.loc[~df['Is Reply'].astype(bool)].groupby('Video Title', sort=False)
+    direct_means = directs[['Like Count', 'Num_Replies']].mean().reindex(titles)
+
+    num_comments = videos.size().reindex(titles).values
+    meta = np.array([stats[title] for title in titles], dtype=np.int64).reshape(-1, 3)
+    num_views = meta[:, 0]
+
+    return pd.DataFrame({
+        'Video Title': titles,
+        'Dataset Name': dataset_name,
+        'Category': category,
+        'Num Views': num_views,
+        'Like Count': meta[:, 1],
+        'Dislike Count': meta[:, 2],
+        'Profane Rate': features['Profane'].values,
+        'Num Comments': num_comments,
+        'Average Comment Length': features['Comment Length'].values,
+        'Average Direct Comment Like Count': direct_means['Like Count'].values,
+        'Average Num Replies': direct_means['Num_Replies'].values,
+        'Num Unique Authors': num_authors.values,
+        'Comments Per View': num_comments / num_views,
+    }, columns=VIDEO_COLUMNS)
+
+
+def build_video_df(frames, datas, dataset_names, categories, processes=None, use_cache=True):
+    """Returns VIDEO_DF, the per-video feature dataframe over all datasets.
+
+    Keyword arguments:
+    frames -- list of cleaned comment dataframes, one per dataset
+    datas -- list of scraped dictionaries, one per dataset (Analyzer.data)
+    dataset_names -- list of dataset names, aligned with frames
+    categories -- dict of dataset name -> category label
+    processes -- number of worker processes (default: one per CPU)
+    use_cache -- whether to reuse and store results under CACHE_FOLDER
+    """
+    assert len(frames) == len(datas) == len(dataset_names)
+    results = [None] * len(frames)
+    pending = []
+    for i, df in enumerate(frames):
+        name = dataset_names[i]
+        df = df[COMMENT_COLUMNS]
+        stats = video_stats(datas[i], df['Video Title'].unique())
+        key = dataset_hash(df, stats, name, categories[name])
+        cached = load_cached('video_features', key) if use_cache else None
+        if cached is not None:
+            print("Loaded cached features for", name)
+            results[i] = cached
+        else:
+            pending.append((i, key, (df, stats, name, categories[name])))
+
+    if pending:
+        errors = []
+        executor = ProcessPoolExecutor(max_workers=processes)
+        try:
+            futures = {executor.submit(dataset_video_features, *args): (i, key)
+                       for i, key, args in pending}
+            # Cache each dataset as soon as it finishes, and let one failing dataset
+            # not hold back or throw away the others.
+            for future in as_completed(futures):
+                i, key = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    print("Failed to compute features for", dataset_names[i], e)
+                    errors.append(e)
+                    continue
+                if use_cache:
+                    save_cached('video_features', key, results[i])
+                print("Computed features for", dataset_names[i])
+        finally:
+            # On an interrupt, drop the queued datasets instead of waiting for them.
+            executor.shutdown(wait=False, cancel_futures=True)
+        if errors:
+            raise errors[0]
+
+    return pd.concat(results, ignore_index=True)